@@ -10,17 +10,44 @@ New: use `--view-db` to print the contents of the configured SQLite DB to the te
 from __future__ import annotations
 
 import argparse
+import asyncio
 import csv
 import json
 import logging
 import os
+import re
 import sys
+import threading
 import time
 import sqlite3
 from datetime import datetime
-from typing import Any, Dict, Iterator, List, Optional
+from queue import Queue
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import aiohttp  # type: ignore
+except ImportError:
+    # Fall back to the synchronous `fetch_leads` if aiohttp is unavailable
+    aiohttp = None
+
+try:
+    import orjson  # type: ignore
+
+    _loads = orjson.loads
+
+    def _dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+except ImportError:
+    # Fall back to the stdlib json module if orjson is unavailable
+    _loads = json.loads
+
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
 
 try:
     from dotenv import load_dotenv  # type: ignore
@@ -39,7 +66,27 @@ except ImportError:
                 value = value.strip().strip('"').strip("'")
                 os.environ.setdefault(key, value)
 
-from utils.db import LeadDB
+from utils.db import Lead, LeadDB
+
+
+# Fallback for timestamps `fromisoformat` rejects but `strptime` used to accept
+# (e.g. fields that aren't zero-padded)
+_ISO_RE = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})T(\d{1,2}):(\d{1,2}):(\d{1,2})")
+
+
+def _parse_naive(body: str) -> datetime:
+    """Parse the wall-time part of a timestamp whose suffix has been stripped."""
+    try:
+        parsed = datetime.fromisoformat(body)
+    except ValueError:
+        match = _ISO_RE.fullmatch(body)
+        if match is None:
+            raise
+        return datetime(*map(int, match.groups()))
+    # The body must not carry an offset of its own (e.g. `...+00:00Z`)
+    if parsed.tzinfo is not None:
+        raise ValueError(f"Unexpected UTC offset in {body}")
+    return parsed
 
 
 def parse_iso_timestamp(ts: str) -> datetime:
@@ -49,14 +96,66 @@ def parse_iso_timestamp(ts: str) -> datetime:
     """
     try:
         if ts.endswith("Z"):
-            return datetime.strptime(ts, "%Y-%m-%dT%H:%M:%SZ")
-        if len(ts) >= 5 and ts[-5] in ["+", "-"]:
-            return datetime.strptime(ts, "%Y-%m-%dT%H:%M:%S%z").replace(tzinfo=None)
+            return _parse_naive(ts[:-1])
+        if len(ts) >= 5 and ts[-5] in "+-":
+            # `+HHMM` offsets are dropped (not applied), so only the wall time matters
+            hh, mm = ts[-4:-2], ts[-2:]
+            if not (hh.isdigit() and mm.isdigit() and int(hh) < 24 and int(mm) < 60):
+                raise ValueError(f"Invalid UTC offset: {ts[-5:]}")
+            return _parse_naive(ts[:-5])
         return datetime.fromisoformat(ts)
     except Exception as exc:
         raise ValueError(f"Invalid ISO timestamp: {ts}") from exc
 
 
+# Server errors are retried with backoff; other 4xx responses fail fast and
+# 429s are retried separately so `Retry-After` is honored
+_TRANSIENT_STATUSES = frozenset(range(500, 600))
+
+
+def _backoff_delay(attempt: int, retry_after: Optional[str] = None) -> int:
+    """Seconds to wait before retrying after `attempt` previous retries.
+
+    Uses an integer `Retry-After` header value when given, otherwise backs off
+    exponentially (1, 2, 4, ... seconds). Shared by the sync and async fetchers.
+    """
+    if retry_after:
+        try:
+            return int(retry_after)
+        except ValueError:
+            pass
+    return 2 ** attempt
+
+
+class _BackoffRetry(Retry):
+    """urllib3 `Retry` that waits according to `_backoff_delay`."""
+
+    def get_backoff_time(self) -> float:
+        return _backoff_delay(len(self.history) - 1) if self.history else 0
+
+
+def _build_session(max_retries: int) -> requests.Session:
+    """Create a keep-alive session that retries transient errors in urllib3.
+
+    5xx responses and connection errors are retried with exponential backoff
+    by the adapter; 429s are left to the caller so `Retry-After` is honored.
+    """
+    retry = _BackoffRetry(
+        total=max_retries,
+        status_forcelist=_TRANSIENT_STATUSES,
+        allowed_methods=frozenset({"GET"}),
+        raise_on_status=False,
+        # 429s are retried by the caller; don't let urllib3 retry them as well
+        respect_retry_after_header=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip, deflate"})
+    return session
+
+
 def fetch_leads(
     access_token: str,
     form_id: str,
@@ -67,7 +166,8 @@ def fetch_leads(
 ) -> Iterator[List[Dict[str, Any]]]:
     """Fetch pages of raw leads from the Graph API.
 
-    Yields a list of lead objects for each page. Retries transient 5xx/429 errors.
+    Yields a list of lead objects for each page. Retries transient 5xx/429 errors;
+    other 4xx responses (e.g. 400, 401) are not retried and raise immediately.
     """
     base_url = f"https://graph.facebook.com/v{api_version}/{form_id}/leads"
     params: Dict[str, Any] = {
@@ -79,24 +179,16 @@ def fetch_leads(
         params["since"] = since
     url: Optional[str] = base_url
 
-    session = requests.Session()
+    session = _build_session(max_retries)
     while url:
         attempt = 0
         while True:
             try:
+                # 5xx and connection errors are retried by the session's adapter
                 resp = session.get(url, params=params if url == base_url else None, timeout=30)
-                # Treat 5xx as transient and handle 429 (rate-limit) specially
-                if resp.status_code >= 500:
-                    raise requests.exceptions.HTTPError(f"Server error {resp.status_code}")
+                # Handle 429 (rate-limit) here so Retry-After is respected
                 if resp.status_code == 429:
-                    retry_after = resp.headers.get("Retry-After")
-                    if retry_after:
-                        try:
-                            delay = int(retry_after)
-                        except Exception:
-                            delay = 2 ** attempt
-                    else:
-                        delay = 2 ** attempt
+                    delay = _backoff_delay(attempt, resp.headers.get("Retry-After"))
                     logging.warning("Rate limited (429). Sleeping %s seconds before retrying.", delay)
                     time.sleep(delay)
                     attempt += 1
@@ -105,17 +197,11 @@ def fetch_leads(
                         resp.raise_for_status()
                     continue
                 resp.raise_for_status()
-                data = resp.json()
+                data = _loads(resp.content)
                 break
             except requests.exceptions.RequestException as e:
-                if attempt < max_retries:
-                    delay = 2 ** attempt
-                    logging.warning("API request failed (%s). Retrying in %s seconds...", e, delay)
-                    time.sleep(delay)
-                    attempt += 1
-                else:
-                    logging.error("API request failed after %d retries: %s", max_retries, e)
-                    raise
+                logging.error("API request failed: %s", e)
+                raise
         leads = data.get("data", [])
         yield leads
         paging = data.get("paging", {})
@@ -123,18 +209,167 @@ def fetch_leads(
         params = None  # Use the `next` URL as-is on subsequent requests
 
 
-def normalize_lead(raw: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    """Normalize a raw lead into a flat dict.
+async def afetch_leads(
+    access_token: str,
+    form_id: str,
+    api_version: str,
+    limit: int = 25,
+    since: Optional[str] = None,
+    max_retries: int = 3,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Async variant of `fetch_leads` built on aiohttp.
 
-    Returns None if both email and phone are missing.
+    Yields a list of lead objects for each page with the same retry behavior.
+    Graph API pages are cursor-linked, so each request still waits on the
+    previous `paging.next`; the gain comes from `_amain` processing a page
+    while the next one is in flight.
     """
-    lead_id: str = raw.get("id")
-    created_time: str = raw.get("created_time")
-    fields = {
-        item.get("name"): (item.get("values") or [None])[0]
-        for item in raw.get("field_data", [])
-        if item.get("name")
+    base_url = f"https://graph.facebook.com/v{api_version}/{form_id}/leads"
+    params: Optional[Dict[str, Any]] = {
+        "access_token": access_token,
+        "fields": "id,created_time,field_data",
+        "limit": limit,
     }
+    if since:
+        params["since"] = since
+    url: Optional[str] = base_url
+
+    timeout = aiohttp.ClientTimeout(total=30)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        while url:
+            attempt = 0
+            while True:
+                try:
+                    async with session.get(url, params=params) as resp:
+                        # Handle 429 (rate-limit) here so Retry-After is respected
+                        if resp.status == 429:
+                            delay = _backoff_delay(attempt, resp.headers.get("Retry-After"))
+                            logging.warning("Rate limited (429). Sleeping %s seconds before retrying.", delay)
+                            await asyncio.sleep(delay)
+                            attempt += 1
+                            if attempt > max_retries:
+                                logging.error("Exceeded max retries after 429 responses")
+                                resp.raise_for_status()
+                            continue
+                        resp.raise_for_status()
+                        data = _loads(await resp.read())
+                    break
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    # Same policy as `_build_session`: retry 5xx and connection
+                    # errors, fail fast on other HTTP errors
+                    transient = (
+                        not isinstance(e, aiohttp.ClientResponseError)
+                        or e.status in _TRANSIENT_STATUSES
+                    )
+                    if transient and attempt < max_retries:
+                        delay = _backoff_delay(attempt)
+                        logging.warning("API request failed (%s). Retrying in %s seconds...", e, delay)
+                        await asyncio.sleep(delay)
+                        attempt += 1
+                    else:
+                        logging.error("API request failed after %d retries: %s", attempt, e)
+                        raise
+            leads = data.get("data", [])
+            yield leads
+            paging = data.get("paging", {})
+            url = paging.get("next")
+            params = None  # Use the `next` URL as-is on subsequent requests
+
+
+async def _amain(
+    pages: AsyncIterator[List[Dict[str, Any]]],
+    handle_page: Callable[[List[Dict[str, Any]]], None],
+    queue_size: int = 2,
+) -> None:
+    """Run `handle_page` on each page while the next page is being fetched.
+
+    Pages flow through a bounded queue; `handle_page` runs in the default
+    executor so SQLite work doesn't block the event loop.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    async def produce() -> None:
+        try:
+            async for page in pages:
+                await queue.put(page)
+        finally:
+            await queue.put(None)  # sentinel: no more pages
+
+    loop = asyncio.get_running_loop()
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            page = await queue.get()
+            if page is None:
+                break
+            await loop.run_in_executor(None, handle_page, page)
+        await producer  # re-raise any fetch error
+    finally:
+        if not producer.done():
+            producer.cancel()
+
+
+def _run_threaded(
+    pages: Iterator[List[Dict[str, Any]]],
+    handle_page: Callable[[List[Dict[str, Any]]], None],
+    queue_size: int = 2,
+) -> None:
+    """Run `handle_page` on a worker thread while the next page is being fetched.
+
+    Threaded counterpart of `_amain` for the synchronous `fetch_leads`. Pages
+    go through a bounded queue so a single thread does all SQLite commits and
+    output writes; `None` tells the worker to stop. Errors from either side
+    are re-raised in the caller.
+    """
+    pages_queue: "Queue[Optional[List[Dict[str, Any]]]]" = Queue(maxsize=queue_size)
+    errors: List[BaseException] = []
+
+    def worker() -> None:
+        while True:
+            page = pages_queue.get()
+            if page is None:
+                return
+            if errors:
+                continue  # keep draining so the producer never blocks
+            try:
+                handle_page(page)
+            except BaseException as exc:
+                errors.append(exc)
+
+    thread = threading.Thread(target=worker, name="lead-writer", daemon=True)
+    thread.start()
+    try:
+        for page in pages:
+            if errors:
+                break
+            pages_queue.put(page)
+    finally:
+        pages_queue.put(None)
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+# Field names `normalize_lead` reads from `field_data`; everything else is ignored
+_WANTED_FIELDS = frozenset(
+    ("full_name", "first_name", "last_name", "email", "phone", "phone_number", "phone_number_ext")
+)
+
+
+def normalize_lead(raw: Dict[str, Any]) -> Optional[Lead]:
+    """Normalize a raw lead into a flat `Lead` record.
+
+    Returns None if both email and phone are missing.
+    """
+    get = raw.get
+    lead_id: str = get("id")
+    created_time: str = get("created_time")
+    # Single pass over field_data keeping only the fields we use
+    fields: Dict[str, Any] = {}
+    for item in get("field_data", ()):
+        field_name = item.get("name")
+        if field_name in _WANTED_FIELDS:
+            fields[field_name] = (item.get("values") or (None,))[0]
     # Name derivation
     name: Optional[str] = fields.get("full_name")
     if not name:
@@ -150,13 +385,20 @@ def normalize_lead(raw: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     )
     if not email and not phone:
         return None
-    return {
-        "lead_id": lead_id,
-        "name": name,
-        "email": email,
-        "phone": phone,
-        "created_time": created_time,
-    }
+    return Lead(lead_id, name, email, phone, created_time)
+
+
+def normalize_page(page: List[Dict[str, Any]]) -> List[Lead]:
+    """Normalize a page of raw leads, dropping those without email and phone."""
+    normalized_page: List[Lead] = []
+    append = normalized_page.append
+    for raw in page:
+        normalized = normalize_lead(raw)
+        if normalized is None:
+            logging.debug("Skipping lead %s: missing email and phone", raw.get("id"))
+            continue
+        append(normalized)
+    return normalized_page
 
 
 def run_offline_sample(sample_path: str) -> Iterator[List[Dict[str, Any]]]:
@@ -165,27 +407,81 @@ def run_offline_sample(sample_path: str) -> Iterator[List[Dict[str, Any]]]:
         script_dir = os.path.dirname(os.path.abspath(__file__))
         repo_root = os.path.dirname(script_dir)
         sample_path = os.path.join(repo_root, sample_path)
-    with open(sample_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    with open(sample_path, "rb") as f:
+        data = _loads(f.read())
     yield data.get("data", [])
 
 
-def write_output(leads: List[Dict[str, Any]], output_format: str) -> None:
-    """Write the list of normalized leads to `new_leads.json` or `new_leads.csv`."""
-    if not leads:
-        logging.info("No new leads to write.")
-        return
-    if output_format == "json":
-        with open("new_leads.json", "w", encoding="utf-8") as f:
-            json.dump(leads, f, indent=2, ensure_ascii=False)
-        logging.info("Wrote %d new leads to new_leads.json", len(leads))
-    else:
-        fieldnames = ["lead_id", "name", "email", "phone", "created_time"]
-        with open("new_leads.csv", "w", newline="") as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(leads)
-        logging.info("Wrote %d new leads to new_leads.csv", len(leads))
+class OutputWriter:
+    """Stream normalized leads to `new_leads.json` or `new_leads.csv`.
+
+    Use as a context manager and call `write(lead)` per lead. The file is only
+    created once the first lead arrives, so a run with no new leads leaves any
+    previous output untouched.
+    """
+
+    FIELDNAMES = Lead._fields
+
+    def __init__(self, output_format: str) -> None:
+        self.output_format = output_format
+        self.path = "new_leads.json" if output_format == "json" else "new_leads.csv"
+        self.count = 0
+        self._file = None
+        self._csv = None
+
+    def __enter__(self) -> "OutputWriter":
+        return self
+
+    def _open(self) -> None:
+        if self.output_format == "json":
+            self._file = open(self.path, "wb")
+            self._file.write(b"[")
+        else:
+            self._file = open(self.path, "w", newline="")
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(self.FIELDNAMES)
+
+    def write(self, lead: Lead) -> None:
+        if self._file is None:
+            self._open()
+        if self._csv is not None:
+            self._csv.writerow(lead)
+        else:
+            # Same layout as json.dump(leads, indent=2) on the full list
+            sep = b"\n  " if self.count == 0 else b",\n  "
+            self._file.write(sep + _dumps(lead._asdict()).replace(b"\n", b"\n  "))
+        self.count += 1
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._file is None:
+            logging.info("No new leads to write.")
+            return
+        if self._csv is None:
+            self._file.write(b"\n]")
+        self._file.close()
+        logging.info("Wrote %d new leads to %s", self.count, self.path)
+
+
+def _quote_ident(name: str) -> str:
+    """Quote an SQLite identifier (table/column name)."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _cell_text(x: Any) -> str:
+    """Render a single DB cell as text, decoding UTF-8 blobs where possible."""
+    if isinstance(x, (bytes, bytearray)):
+        try:
+            return x.decode("utf-8")
+        except UnicodeDecodeError:
+            return repr(x)
+    return str(x)
+
+
+def _fmt(x: Any, encoding: str) -> bytes:
+    """Encode a single DB cell for the raw stdout buffer."""
+    if isinstance(x, str):
+        return x.encode(encoding, errors="replace")
+    return _cell_text(x).encode(encoding, errors="replace")
 
 
 def view_db(db_path: str, max_rows_per_table: int = 200) -> None:
@@ -196,37 +492,44 @@ def view_db(db_path: str, max_rows_per_table: int = 200) -> None:
     try:
         conn = sqlite3.connect(db_path)
         cur = conn.cursor()
-        cur.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")
+        cur.arraysize = 500
+        cur.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        )
         tables = [row[0] for row in cur.fetchall()]
         if not tables:
             print(f"No tables found in {db_path}")
             return
+        encoding = sys.stdout.encoding or "utf-8"
+        # Text-only streams (redirect_stdout, captured output) have no buffer
+        buffer = getattr(sys.stdout, "buffer", None)
+        if buffer is not None:
+            def emit(r: Any) -> None:
+                buffer.write(b", ".join([_fmt(x, encoding) for x in r]) + b"\n")
+        else:
+            def emit(r: Any) -> None:
+                sys.stdout.write(", ".join([_cell_text(x) for x in r]) + "\n")
         for table in tables:
             print("\n" + "=" * 60)
             print(f"Table: {table}")
             print("=" * 60)
-            cur.execute(f"PRAGMA table_info('{table}')")
+            cur.execute(f"PRAGMA table_info({_quote_ident(table)})")
             cols = [r[1] for r in cur.fetchall()]
-            cur.execute(f"SELECT * FROM '{table}' LIMIT {max_rows_per_table}")
-            rows = cur.fetchall()
+            cur.execute(f"SELECT * FROM {_quote_ident(table)} LIMIT ?", (max_rows_per_table,))
+            rows = cur.fetchmany()
             if not rows:
                 print("(no rows)")
                 continue
             # Print header
             print(", ".join(cols))
-            # Print rows
-            for r in rows:
-                # decode bytes if necessary
-                printable = []
-                for x in r:
-                    if isinstance(x, (bytes, bytearray)):
-                        try:
-                            printable.append(x.decode("utf-8"))
-                        except Exception:
-                            printable.append(repr(x))
-                    else:
-                        printable.append(str(x))
-                print(", ".join(printable))
+            # Stream rows straight to the stdout buffer, one batch at a time
+            sys.stdout.flush()
+            while rows:
+                for r in rows:
+                    emit(r)
+                rows = cur.fetchmany()
+            if buffer is not None:
+                buffer.flush()
         print("\n-- End of DB preview --")
     except Exception as exc:
         print(f"Error reading DB {db_path}: {exc}")
@@ -324,47 +627,68 @@ def main() -> None:
 
     # Determine since parameter
     since_param: Optional[str] = None
+    # Parsed once here rather than for every lead
+    since_dt: Optional[datetime] = None
     if args.since:
         # Validate timestamp format early
-        _ = parse_iso_timestamp(args.since)  # raises if invalid
+        since_dt = parse_iso_timestamp(args.since)  # raises if invalid
         since_param = args.since
 
-    # Iterate through pages
-    new_leads: List[Dict[str, Any]] = []
-    if offline_mode:
-        pages = run_offline_sample("data/meta_leads_sample.json")
-    else:
-        pages = fetch_leads(
-            access_token,
-            form_id,
-            api_version,
-            limit=args.limit,
-            since=since_param,
-            max_retries=args.max_retries,
-        )
-
-    for page in pages:
-        for raw in page:
-            normalized = normalize_lead(raw)
-            if normalized is None:
-                logging.debug("Skipping lead %s: missing email and phone", raw.get("id"))
-                continue
-            lead_id = normalized["lead_id"]
-            email = normalized.get("email") or ""
-            phone = normalized.get("phone") or ""  
+    def handle_page(page: List[Dict[str, Any]]) -> None:
+        page_normalized: List[Lead] = []
+        for normalized in normalize_page(page):
             # Apply since filter if offline mode (since API param is not used)
-            if since_param and offline_mode:
-                created_dt = parse_iso_timestamp(normalized["created_time"])
-                if created_dt < parse_iso_timestamp(since_param):
+            if since_dt and offline_mode:
+                created_dt = parse_iso_timestamp(normalized.created_time)
+                if created_dt < since_dt:
                     continue
-            if db.is_seen(lead_id, email, phone):
-                continue
-            db.mark_seen(normalized)
-            new_leads.append(normalized)
+            page_normalized.append(normalized)
+        # Record the page in one transaction; the DB's unique indexes drop
+        # duplicates, so only the leads actually inserted are new
+        for normalized in db.mark_seen_many(page_normalized):
+            writer.write(normalized)
+
+    # Iterate through pages, streaming new leads to the output file
+    with OutputWriter(args.output) as writer:
+        if offline_mode:
+            # Seeding an empty DB from the sample: gather planner statistics
+            # once the rows are in rather than on an empty table
+            db.begin_bulk()
+            try:
+                for page in run_offline_sample("data/meta_leads_sample.json"):
+                    handle_page(page)
+            finally:
+                db.end_bulk()
+        elif aiohttp is not None:
+            # Overlap fetching the next page with processing the current one
+            asyncio.run(
+                _amain(
+                    afetch_leads(
+                        access_token,
+                        form_id,
+                        api_version,
+                        limit=args.limit,
+                        since=since_param,
+                        max_retries=args.max_retries,
+                    ),
+                    handle_page,
+                )
+            )
+        else:
+            # Same overlap with a writer thread when aiohttp is unavailable
+            _run_threaded(
+                fetch_leads(
+                    access_token,
+                    form_id,
+                    api_version,
+                    limit=args.limit,
+                    since=since_param,
+                    max_retries=args.max_retries,
+                ),
+                handle_page,
+            )
 
-    # Write output
-    write_output(new_leads, args.output)
-    logging.info("Total new leads written: %d", len(new_leads))
+    logging.info("Total new leads written: %d", writer.count)
 
 
 if __name__ == "__main__":
@@ -5,20 +5,84 @@ This implementation stores full lead details (lead_id, name, email, phone,
 created_time) while remaining backward-compatible with older code that only
 inserted lead_id strings.
 
+Leads can be passed either as `Lead` named tuples or as plain dicts with the
+same keys.
+
 APIs:
+- Lead(lead_id, name, email, phone, created_time)  # normalized lead record
 - LeadDB(db_path)          # construct
 - is_seen(lead_id) -> bool
-- mark_seen(lead_or_id)    # accepts either a lead dict or a lead_id str
+- filter_unseen(leads) -> list           # batch check for a page of leads
+- mark_seen(lead_or_id)    # accepts a Lead, a lead dict or a lead_id str
+- mark_seen_many(leads) -> list          # bulk insert a page, returns the newly inserted leads
+- begin_bulk() / end_bulk()               # defer ANALYZE while seeding an empty DB
 - fetch_all(limit=None) -> list[dict]   # returns rows as dicts
 - close()
 """
 
 import os
 import sqlite3
-from typing import Any, Dict, List, Optional, Union
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Union
+
+
+class Lead(NamedTuple):
+    """A normalized lead; field order matches the `seen_leads` columns."""
+
+    lead_id: str
+    name: Optional[str]
+    email: Optional[str]
+    phone: Optional[str]
+    created_time: Optional[str]
+
+
+LeadLike = Union[Lead, Dict[str, Any]]
+
+
+def _as_lead(lead: LeadLike) -> Lead:
+    """Return `lead` as a `Lead`, converting from a dict if needed.
+
+    Non-string lead_id/email/phone values are converted with `str()`, so the
+    keys bound to SQLite compare equal to the TEXT values it stores.
+    """
+    if not isinstance(lead, Lead):
+        lead = Lead(
+            lead.get("lead_id"),
+            lead.get("name"),
+            lead.get("email"),
+            lead.get("phone"),
+            lead.get("created_time"),
+        )
+    lead_id, _, email, phone, _ = lead
+    if all(v is None or isinstance(v, str) for v in (lead_id, email, phone)):
+        return lead
+    return lead._replace(
+        lead_id=None if lead_id is None else str(lead_id),
+        email=None if email is None else str(email),
+        phone=None if phone is None else str(phone),
+    )
 
 
 class LeadDB:
+    # Max number of (field, value) keys kept in the in-process seen cache
+    CACHE_CAP = 100_000
+    # Rows per multi-row INSERT, keeping bound parameters well under SQLite's limit
+    INSERT_CHUNK = 500
+
+    # Fixed SQL text so sqlite3's statement cache reuses the prepared statements
+    _SQL_SEEN = """
+        SELECT lead_id, email, phone FROM seen_leads WHERE lead_id=?
+        UNION ALL
+        SELECT lead_id, email, phone FROM seen_leads WHERE email=?
+        UNION ALL
+        SELECT lead_id, email, phone FROM seen_leads WHERE phone=?
+        LIMIT 1
+    """
+    _SQL_INSERT = """
+        INSERT OR IGNORE INTO seen_leads (lead_id, name, email, phone, created_time)
+        VALUES (?, ?, ?, ?, ?)
+    """
+
     def __init__(self, db_path: str) -> None:
         # Ensure parent directory exists
         db_dir = os.path.dirname(db_path)
@@ -27,10 +91,40 @@ class LeadDB:
 
         # Connect to the database (allow same-thread usage)
         # Use row_factory to return rows as sqlite3.Row (mapping behavior)
-        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        # Keep enough prepared statements cached for the per-size multi-row inserts
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, cached_statements=256)
         self._conn.row_factory = sqlite3.Row
+        self._configure()
         self._create_table()
 
+        # LRU of ("lead_id"|"email"|"phone", value) keys known to be stored, so
+        # repeats within a run are answered without touching SQLite
+        self._seen_cache: "OrderedDict[tuple, None]" = OrderedDict()
+        self._cache_cap = self.CACHE_CAP
+
+        # True between begin_bulk() and end_bulk()
+        self._bulk = False
+
+    def _configure(self) -> None:
+        """Tune connection PRAGMAs for a write-heavy dedup workload.
+
+        WAL avoids a rollback-journal fsync on every commit and NORMAL sync drops
+        another; the larger page cache keeps the lookup indexes in memory.
+        `page_size` only takes effect on a fresh DB, so it must run before the
+        table is created and before switching to WAL.
+        """
+        self._conn.executescript(
+            """
+            PRAGMA page_size=4096;
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            PRAGMA temp_store=MEMORY;
+            PRAGMA cache_size=-65536;
+            PRAGMA mmap_size=268435456;
+            PRAGMA busy_timeout=60000;
+            """
+        )
+
     def _create_table(self) -> None:
         """Create the table if it doesn't already exist (new schema)."""
         with self._conn:
@@ -45,23 +139,146 @@ class LeadDB:
                 )
                 """
             )
+            self._create_indexes()
+        # Gather planner statistics on the first open that finds data. ANALYZE on
+        # an empty table leaves sqlite_stat1 empty, so check for rows rather
+        # than the table's existence; later opens reuse the stored statistics.
+        has_stat_table = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='sqlite_stat1'"
+        ).fetchone()
+        has_stats = has_stat_table and self._conn.execute("SELECT 1 FROM sqlite_stat1 LIMIT 1").fetchone()
+        if not has_stats and self._conn.execute("SELECT 1 FROM seen_leads LIMIT 1").fetchone():
+            self._conn.execute("ANALYZE")
+
+    def _create_indexes(self) -> None:
+        """Create the partial unique indexes on email and phone.
+
+        Besides avoiding full table scans for email/phone lookups, they make
+        INSERT OR IGNORE reject duplicates on any of lead_id, email or phone.
+        """
+        self._conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_email ON seen_leads(email) WHERE email IS NOT NULL"
+        )
+        self._conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_phone ON seen_leads(phone) WHERE phone IS NOT NULL"
+        )
+
+    def begin_bulk(self) -> bool:
+        """Start seeding an empty DB, deferring `ANALYZE` until `end_bulk()`.
+
+        The unique lead_id/email/phone indexes stay in place, since they are
+        what rejects duplicates from every write path and connection. An open
+        of an empty DB skips `ANALYZE`, so the statistics are gathered once the
+        seed is in. This is a no-op returning False if the table already has
+        rows.
+        """
+        if self._bulk:
+            return True
+        if self._conn.execute("SELECT 1 FROM seen_leads LIMIT 1").fetchone():
+            return False
+        self._bulk = True
+        return True
+
+    def end_bulk(self) -> None:
+        """Finish a bulk load and refresh the planner statistics."""
+        if not self._bulk:
+            return
+        self._conn.execute("ANALYZE")
+        self._bulk = False
+
+    def _cache_hit(self, lead_id: Optional[str], email: Optional[str], phone: Optional[str]) -> bool:
+        """Return True if any non-empty key is in the seen cache (and refresh it)."""
+        cache = self._seen_cache
+        for key in (("lead_id", lead_id), ("email", email), ("phone", phone)):
+            if key[1] and key in cache:
+                cache.move_to_end(key)
+                return True
+        return False
+
+    def _cache_add(self, lead_id: Optional[str], email: Optional[str], phone: Optional[str]) -> None:
+        """Remember the non-empty keys of a stored row, evicting the oldest over cap."""
+        cache = self._seen_cache
+        for key in (("lead_id", lead_id), ("email", email), ("phone", phone)):
+            if key[1]:
+                cache[key] = None
+                cache.move_to_end(key)
+        while len(cache) > self._cache_cap:
+            cache.popitem(last=False)
 
     def is_seen(self, lead_id: str, email: str, phone :str) -> bool:
         """Return True if the given lead ID has already been recorded."""
-        cur = self._conn.cursor()
-        try:
-            # Check for existence of duplicate by lead_id, email or phone
-            cur.execute("SELECT 1 FROM seen_leads WHERE lead_id=? OR email=? OR phone=?",(lead_id, email, phone))  
-            return cur.fetchone() is not None
-        finally:
-            cur.close()
+        if self._cache_hit(lead_id, email, phone):
+            return True
+        # Check for existence of duplicate by lead_id, email or phone.
+        # One single-predicate probe per key so each branch searches its own
+        # index; LIMIT 1 stops at the first match.
+        row = self._conn.execute(self._SQL_SEEN, (lead_id, email, phone)).fetchone()
+        if row is None:
+            return False
+        # Cache the matching stored row, not the probe keys
+        self._cache_add(row["lead_id"], row["email"], row["phone"])
+        return True
+
+    def filter_unseen(self, leads: List[LeadLike]) -> List[LeadLike]:
+        """Return the leads that are not already recorded, in their original order.
+
+        Looks up a whole page with a single query instead of one `is_seen` call
+        per lead. A lead is dropped if its lead_id, email or phone matches a
+        stored row, or an earlier lead in the same batch.
+        """
+        # Leads already known from this run never reach SQLite
+        batch = []
+        for item in leads:
+            lead = _as_lead(item)
+            if not self._cache_hit(lead.lead_id, lead.email, lead.phone):
+                batch.append((item, lead))
+        if not batch:
+            return []
+        ids = [lead.lead_id for _, lead in batch if lead.lead_id]
+        emails = [lead.email for _, lead in batch if lead.email]
+        phones = [lead.phone for _, lead in batch if lead.phone]
+
+        def placeholders(values: List[str]) -> str:
+            # `IN ()` is not valid SQL, so bind a single NULL for empty lists
+            return ",".join("?" * len(values)) if values else "NULL"
+
+        sql = (
+            "SELECT lead_id, email, phone FROM seen_leads "
+            f"WHERE lead_id IN ({placeholders(ids)}) "
+            f"OR email IN ({placeholders(emails)}) "
+            f"OR phone IN ({placeholders(phones)})"
+        )
+        rows = self._conn.execute(sql, (*ids, *emails, *phones)).fetchall()
+
+        for r in rows:
+            self._cache_add(r["lead_id"], r["email"], r["phone"])
+        seen_ids = {r["lead_id"] for r in rows}
+        seen_emails = {r["email"] for r in rows if r["email"]}
+        seen_phones = {r["phone"] for r in rows if r["phone"]}
 
-    def mark_seen(self, lead_or_id: Union[str, Dict[str, Any]]) -> None:
+        unseen: List[LeadLike] = []
+        for item, (lead_id, _, email, phone, _) in batch:
+            if (
+                lead_id in seen_ids
+                or (email and email in seen_emails)
+                or (phone and phone in seen_phones)
+            ):
+                continue
+            # Track keys so later duplicates within the same batch are skipped too
+            seen_ids.add(lead_id)
+            if email:
+                seen_emails.add(email)
+            if phone:
+                seen_phones.add(phone)
+            unseen.append(item)
+        return unseen
+
+    def mark_seen(self, lead_or_id: Union[str, LeadLike]) -> None:
         """Record a lead as processed.
 
         Accepts either:
         - a lead_id string (backwards compatible), or
-        - a lead dict with keys: lead_id, name, email, phone, created_time.
+        - a `Lead`, or a lead dict with keys: lead_id, name, email, phone, created_time.
 
         Duplicate inserts are ignored.
         """
@@ -69,14 +286,12 @@ class LeadDB:
         if isinstance(lead_or_id, str):
             lead_id = lead_or_id
             name = email = phone = created_time = None
-        elif isinstance(lead_or_id, dict):
-            lead_id = lead_or_id.get("lead_id")
-            name = lead_or_id.get("name")
-            email = lead_or_id.get("email")
-            phone = lead_or_id.get("phone")
-            created_time = lead_or_id.get("created_time")
+        elif isinstance(lead_or_id, (Lead, dict)):
+            lead_id, name, email, phone, created_time = _as_lead(lead_or_id)
+            email = email or None
+            phone = phone or None
         else:
-            raise TypeError("mark_seen expects a lead_id string or a lead dict")
+            raise TypeError("mark_seen expects a lead_id string, a Lead or a lead dict")
 
         if not lead_id:
             # Nothing to do for invalid input
@@ -84,29 +299,70 @@ class LeadDB:
 
         with self._conn:
             # Insert or ignore to preserve idempotency
-            self._conn.execute(
-                """
-                INSERT OR IGNORE INTO seen_leads (lead_id, name, email, phone, created_time)
-                VALUES (?, ?, ?, ?, ?)
-                """,
-                (lead_id, name, email, phone, created_time),
-            )
+            cur = self._conn.execute(self._SQL_INSERT, (lead_id, name, email, phone, created_time))
+        # An ignored insert could have conflicted on any of the three keys
+        if cur.rowcount == 1:
+            self._cache_add(lead_id, email, phone)
+
+    def mark_seen_many(self, leads: List[LeadLike]) -> List[LeadLike]:
+        """Record a batch of leads as processed in a single transaction.
+
+        Returns the leads that were actually inserted, in their original order.
+        The unique lead_id/email/phone indexes make `INSERT OR IGNORE` skip any
+        lead that duplicates a stored row or an earlier lead in the batch, so no
+        separate existence query is needed. Leads without a lead_id are skipped.
+        """
+        batch = []
+        for item in leads:
+            lead = _as_lead(item)
+            if lead.lead_id and not self._cache_hit(lead.lead_id, lead.email, lead.phone):
+                batch.append((item, lead))
+        if not batch:
+            return []
+        # `Lead` tuples bind positionally; empty strings are stored as NULL so
+        # they never collide in the unique indexes
+        rows = [
+            lead if lead.email != "" and lead.phone != ""
+            else lead._replace(email=lead.email or None, phone=lead.phone or None)
+            for _, lead in batch
+        ]
+        # Keyed on (lead_id, email, phone): two leads can share a lead_id while
+        # only the later one is inserted (the first clashing on email/phone)
+        inserted = set()
+        with self._conn:
+            for start in range(0, len(rows), self.INSERT_CHUNK):
+                chunk = rows[start:start + self.INSERT_CHUNK]
+                values = ",".join(["(?, ?, ?, ?, ?)"] * len(chunk))
+                cur = self._conn.execute(
+                    f"""
+                    INSERT OR IGNORE INTO seen_leads (lead_id, name, email, phone, created_time)
+                    VALUES {values}
+                    RETURNING lead_id, email, phone
+                    """,
+                    [v for row in chunk for v in row],
+                )
+                inserted.update(tuple(r) for r in cur.fetchall())
+        new_leads: List[LeadLike] = []
+        for (item, _), (lead_id, _, email, phone, _) in zip(batch, rows):
+            key = (lead_id, email, phone)
+            if key in inserted:
+                # Exact repeats share a key but only the first copy was inserted
+                inserted.discard(key)
+                self._cache_add(lead_id, email, phone)
+                new_leads.append(item)
+        return new_leads
 
     def fetch_all(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
         """Return all stored leads as a list of dictionaries.
 
         `limit` can be provided to restrict rows for previewing.
         """
-        cur = self._conn.cursor()
-        try:
-            sql = "SELECT lead_id, name, email, phone, created_time FROM seen_leads ORDER BY rowid"
-            if limit:
-                sql = f"{sql} LIMIT {int(limit)}"
-            cur.execute(sql)
-            rows = cur.fetchall()
-            return [dict(r) for r in rows]
-        finally:
-            cur.close()
+        sql = "SELECT lead_id, name, email, phone, created_time FROM seen_leads ORDER BY rowid"
+        if limit:
+            rows = self._conn.execute(f"{sql} LIMIT ?", (int(limit),)).fetchall()
+        else:
+            rows = self._conn.execute(sql).fetchall()
+        return [dict(r) for r in rows]
 
     def close(self) -> None:
         try:
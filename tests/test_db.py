@@ -0,0 +1,31 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from utils.db import LeadDB  # noqa: E402
+
+
+class SeenQueryPlanTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.db = LeadDB(os.path.join(self._tmp.name, "seen_leads.db"))
+
+    def tearDown(self):
+        self.db.close()
+        self._tmp.cleanup()
+
+    def test_each_seen_branch_searches_an_index(self):
+        plan = [
+            row["detail"]
+            for row in self.db._conn.execute("EXPLAIN QUERY PLAN " + LeadDB._SQL_SEEN, (None, None, None))
+        ]
+        searches = [d for d in plan if d.startswith("SEARCH seen_leads") and "INDEX" in d]
+        self.assertEqual(len(searches), 3, plan)
+        self.assertFalse([d for d in plan if d.startswith("SCAN seen_leads")], plan)
+
+
+if __name__ == "__main__":
+    unittest.main()